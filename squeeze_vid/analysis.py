@@ -0,0 +1,190 @@
+import hashlib
+import json
+import re
+import sys
+from ffmpeg import errors
+from ffmpeg import FFmpeg
+
+from . import config
+from .remote import get_input_options
+from .remote import get_input_url
+from .remote import get_remote_info
+from .remote import is_url
+
+SILENCE_NOISE = '-40dB'  # audio below this level counts as silence
+FREEZE_NOISE = '-60dB'  # frame differences below this count as frozen
+BLACK_PIXEL_THRESHOLD = 0.10
+MIN_GAP = 3.0  # seconds of dead air needed before it's cut
+PADDING = 0.5  # seconds of dead air kept on each side of a cut
+MIN_SEGMENT = 0.1  # seconds; shorter kept segments are dropped
+
+RE_SILENCE_START = re.compile(r'silence_start: *(-?[\d.]+)')
+RE_SILENCE_END = re.compile(r'silence_end: *(-?[\d.]+)')
+RE_FREEZE_START = re.compile(r'freeze_start: *(-?[\d.]+)')
+RE_FREEZE_END = re.compile(r'freeze_end: *(-?[\d.]+)')
+RE_BLACK = re.compile(r'black_start: *(-?[\d.]+) +black_end: *(-?[\d.]+)')
+
+
+def find_kept_segments(infile, duration, min_gap=MIN_GAP, padding=PADDING,
+                       check_video=False):
+    """
+    Return list of (start, end) segments of infile that aren't dead air.
+    """
+    dead = get_dead_air(infile, duration, min_gap, check_video)
+    return invert_intervals(dead, duration, min_gap, padding)
+
+
+def get_dead_air(infile, duration, min_gap=MIN_GAP, check_video=False):
+    """
+    Return list of (start, end) intervals of silence, optionally limited to
+    where the video is also frozen or black. Results are cached per input.
+    """
+    params = {
+        'silence_noise': SILENCE_NOISE,
+        'min_gap': min_gap,
+        'check_video': check_video,
+    }
+    if check_video:
+        params['freeze_noise'] = FREEZE_NOISE
+        params['black_pixel_threshold'] = BLACK_PIXEL_THRESHOLD
+    cache_file = get_cache_file(infile, params)
+    if cache_file.is_file():
+        if config.VERBOSE:
+            print(f"Using cached analysis: {cache_file}")
+        return [tuple(i) for i in json.loads(cache_file.read_text()).get('dead')]  # noqa: E501
+
+    lines = run_detection(infile, min_gap, check_video)
+    dead = parse_intervals(lines, RE_SILENCE_START, RE_SILENCE_END, duration)  # noqa: E501
+    if check_video:
+        still = parse_intervals(lines, RE_FREEZE_START, RE_FREEZE_END, duration)  # noqa: E501
+        still.extend(parse_black_intervals(lines))
+        dead = intersect_intervals(dead, merge_intervals(still))
+
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    cache_file.write_text(json.dumps({'params': params, 'dead': dead}))
+    return dead
+
+
+def get_cache_file(infile, params):
+    # Key on file identity and detection params so changed files or settings
+    # are analyzed again.
+    if is_url(infile):
+        identity = get_remote_info(infile)
+    else:
+        stat = infile.stat()
+        identity = [stat.st_size, stat.st_mtime_ns]
+    key = json.dumps([str(infile), identity, params], sort_keys=True)
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return config.CACHE_DIR / 'analysis' / f"{digest}.json"
+
+
+def run_detection(infile, min_gap, check_video):
+    """
+    Decode infile with detection filters and return ffmpeg's log lines.
+    """
+    output_kwargs = {
+        'f': 'null',
+        'af': f"silencedetect=noise={SILENCE_NOISE}:duration={min_gap}",
+    }
+    if check_video:
+        output_kwargs['vf'] = (
+            f"freezedetect=noise={FREEZE_NOISE}:duration={min_gap},"
+            f"blackdetect=duration={min_gap}:pixel_black_th={BLACK_PIXEL_THRESHOLD}"  # noqa: E501
+        )
+    else:
+        # Audio-only pass: don't decode video at all.
+        output_kwargs['vn'] = None
+    ffmpeg = (
+        FFmpeg()
+        .option('hide_banner')
+        .option('nostats')
+        .option('loglevel', 'info')
+        .input(get_input_url(infile), get_input_options(infile))
+        .output('-', **output_kwargs)
+    )
+    lines = []
+
+    @ffmpeg.on('stderr')
+    def on_stderr(line):
+        if config.DEBUG:
+            print(line)
+        lines.append(line)
+
+    print(f"Analyzing {infile}")
+    try:
+        ffmpeg.execute()
+    except errors.FFmpegError as e:
+        print(f"{e.message}; command: {e.arguments}")
+        sys.exit(1)
+    return lines
+
+
+def parse_intervals(lines, re_start, re_end, duration):
+    intervals = []
+    start = None
+    for line in lines:
+        m = re_start.search(line)
+        if m:
+            start = max(float(m.group(1)), 0.0)
+            continue
+        m = re_end.search(line)
+        if m and start is not None:
+            intervals.append((start, float(m.group(1))))
+            start = None
+    if start is not None:
+        # Interval lasts until the end of the file.
+        intervals.append((start, float(duration)))
+    return intervals
+
+
+def parse_black_intervals(lines):
+    intervals = []
+    for line in lines:
+        m = RE_BLACK.search(line)
+        if m:
+            intervals.append((float(m.group(1)), float(m.group(2))))
+    return intervals
+
+
+def merge_intervals(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def intersect_intervals(a, b):
+    intervals = []
+    for a_start, a_end in a:
+        for b_start, b_end in b:
+            start, end = max(a_start, b_start), min(a_end, b_end)
+            if end > start:
+                intervals.append((start, end))
+    return intervals
+
+
+def invert_intervals(dead, duration, min_gap=MIN_GAP, padding=PADDING):
+    """
+    Return the segments between dead intervals that are at least min_gap
+    long, keeping padding seconds of each dead interval next to a segment.
+    """
+    duration = float(duration)
+    segments = []
+    position = 0.0
+    for start, end in merge_intervals(dead):
+        if end - start < min_gap:
+            continue
+        # Don't pad beyond the beginning or end of the file.
+        cut_start = start + padding if start > 0 else start
+        cut_end = end - padding if end < duration else end
+        if cut_end <= cut_start:
+            continue
+        if cut_start - position >= MIN_SEGMENT:
+            segments.append((round(position, 3), round(cut_start, 3)))
+        position = cut_end
+    if duration - position >= MIN_SEGMENT:
+        segments.append((round(position, 3), round(duration, 3)))
+    return segments
@@ -1,13 +1,64 @@
 import argparse
 import sys
+from functools import partial
 from pathlib import Path
 
+from . import analysis
 from . import config
+from . import remote
+from . import verify
+from .distributed import Coordinator
+from .distributed import Worker
+from .governor import Governor
+from .governor import parse_cpu_list
+from .journal import Journal
 from .media import MediaObject
 from .task import SqueezeTask
 from .util import validate_file
 
 
+def jobs_count(value):
+    if value == 'auto':
+        return value
+    try:
+        count = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid job count: {value}")
+    if count < 1:
+        raise argparse.ArgumentTypeError(f"invalid job count: {value}")
+    return count
+
+
+def cpu_list(value):
+    try:
+        cpus = parse_cpu_list(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid CPU list: {value}")
+    if not cpus:
+        raise argparse.ArgumentTypeError(f"invalid CPU list: {value}")
+    return value
+
+
+def cpu_quota(value):
+    try:
+        percent = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid CPU quota: {value}")
+    if not 1 <= percent <= 100:
+        raise argparse.ArgumentTypeError(f"CPU quota must be from 1 to 100: {value}")  # noqa: E501
+    return percent
+
+
+def niceness(value):
+    try:
+        nice = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid niceness: {value}")
+    if not 0 <= nice <= 19:
+        raise argparse.ArgumentTypeError(f"niceness must be from 0 to 19: {value}")  # noqa: E501
+    return nice
+
+
 def get_parser():
     # Build arguments and options list.
     description = (
@@ -42,6 +93,12 @@ def get_parser():
         action='store_true',
         help="show stream properties of given file (only 1 accepted)"
     )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=jobs_count,
+        default=1,
+        help="number of files to process at once [1]; 'auto' adjusts it to the system load and free memory",  # noqa: E501
+    )
     parser.add_argument(
         '-k', '--trim',
         nargs=2,
@@ -86,6 +143,85 @@ def get_parser():
         action='store_true',
         help="shortcut to use libsvtav1 video encoder"
     )
+    parser.add_argument(
+        '--cut-silence',
+        action='store_true',
+        help="remove silent stretches (dead air) from the file before normalizing or exporting audio",  # noqa: E501
+    )
+    parser.add_argument(
+        '--cut-still',
+        action='store_true',
+        help="with --cut-silence, only cut silence where the video is also frozen or black",  # noqa: E501
+    )
+    parser.add_argument(
+        '--min-silence',
+        type=float,
+        default=analysis.MIN_GAP,
+        metavar='SECONDS',
+        help=f"shortest dead air to cut with --cut-silence [{analysis.MIN_GAP}]",  # noqa: E501
+    )
+    parser.add_argument(
+        '--cut-padding',
+        type=float,
+        default=analysis.PADDING,
+        metavar='SECONDS',
+        help=f"dead air to keep on either side of each cut [{analysis.PADDING}]",  # noqa: E501
+    )
+    parser.add_argument(
+        '--cpu-quota',
+        type=cpu_quota,
+        default=100,
+        metavar='PERCENT',
+        help="percentage of available CPUs that encoders may use [100]",
+    )
+    parser.add_argument(
+        '--cpus',
+        type=cpu_list,
+        metavar='LIST',
+        help="only run on the given CPUs, e.g. '0-3,6'",
+    )
+    parser.add_argument(
+        '--nice',
+        type=niceness,
+        help="run ffmpeg with the given niceness (0 to 19)",
+    )
+    parser.add_argument(
+        '--ionice',
+        type=str,
+        metavar='CLASS[:LEVEL]',
+        help="run ffmpeg with the given IO scheduling class (realtime, best-effort, idle) and level (0 to 7)",  # noqa: E501
+    )
+    parser.add_argument(
+        '--verify',
+        type=int,
+        nargs='?',
+        const=verify.SAMPLES,
+        default=0,
+        metavar='SAMPLES',
+        help=f"check each output's duration, streams, size and frame rate, and decode-test SAMPLES short windows of it [{verify.SAMPLES}]",  # noqa: E501
+    )
+    parser.add_argument(
+        '--retries',
+        type=int,
+        default=0,
+        help="number of times to redo a conversion that fails or fails verification [0]",  # noqa: E501
+    )
+    parser.add_argument(
+        '--journal',
+        type=str,
+        metavar='FILE',
+        help="append the result of each conversion to FILE as JSON lines",
+    )
+    parser.add_argument(
+        '--http-cache',
+        action='store_true',
+        help="keep the parts of http(s) input files that are read in a local cache so they're only downloaded once",  # noqa: E501
+    )
+    parser.add_argument(
+        '--join',
+        action='store_true',
+        help="join the given files, in order, into a single file; streams are copied if the files are compatible, otherwise they're normalized",  # noqa: E501
+    )
     parser.add_argument(
         '--video_encoder',
         type=str,
@@ -94,6 +230,23 @@ def get_parser():
             "use 'squeeze-vid.ffmpeg -encoders' for details"
         )
     )
+    parser.add_argument(
+        '--serve',
+        type=str,
+        metavar='ADDRESS',
+        help="queue the given files as jobs and serve them to workers at ADDRESS ([HOST]:PORT or unix:PATH)",  # noqa: E501
+    )
+    parser.add_argument(
+        '--upload',
+        action='store_true',
+        help="with --serve, send files to workers over the connection instead of using a shared filesystem",  # noqa: E501
+    )
+    parser.add_argument(
+        '--worker',
+        type=str,
+        metavar='ADDRESS',
+        help="pull and process jobs from the coordinator at ADDRESS ([HOST]:PORT or unix:PATH)",  # noqa: E501
+    )
     parser.add_argument(
         '-x', '--experimental',
         action='store_true',
@@ -102,13 +255,156 @@ def get_parser():
     parser.add_argument(
         "file",
         nargs='*',
-        help="space-separated list of media files to modify"
+        help="space-separated list of media files or http(s) URLs to modify"
     )
     return parser
 
 
+def process_file(args, input_file, progress_callback=None, threads=None,
+                 journal=None):
+    """
+    Run the requested actions on a single input file; return final output.
+    """
+    def new_task(input_file):
+        task = SqueezeTask(args=args, media_in=MediaObject(input_file))
+        task.progress_callback = progress_callback
+        task.threads = threads
+        task.journal = journal
+        return task
+
+    mod_file = Path()
+    # mod_file_prev = Path()
+    task = new_task(input_file)
+
+    if args.experimental:
+        # Try out new, experimental features.
+        task.action = 'trim'
+        task.setup()
+        mod_file = task.run()
+        sys.exit()
+
+    if args.info:
+        # Show the video file info.
+        media_in = MediaObject(input_file)
+        media_in.show_properties()
+        return None
+
+    if args.trim:
+        # Trim the file using given timestamps.
+        mod_file = task.trim()
+
+    if args.speed:
+        # Use mod_file from previous step as input_file if it exists.
+        if isinstance(mod_file, Path) and mod_file.is_file():
+            task = new_task(mod_file)
+            # mod_file_prev = mod_file
+        # Attempt to change the playback speed of all passed video files.
+        mod_file = task.change_speed()
+
+    if args.audio:
+        # Use mod_file from previous step as input_file if it exists.
+        if isinstance(mod_file, Path) and mod_file.is_file():
+            task = new_task(mod_file)
+            task.media_out.suffix = '.mp3'
+            # mod_file_prev = mod_file
+        set_segments(args, task)
+        # Convert file(s) to normalized MP3.
+        mod_file = task.export_audio()
+
+    if normalizes(args):
+        # Use mod_file from previous step as input_file if it exists.
+        if isinstance(mod_file, Path) and mod_file.is_file():
+            task = new_task(mod_file)
+            # mod_file_prev = mod_file
+        set_segments(args, task)
+        # Attempt to normalize all passed files.
+        mod_file = task.normalize()
+
+    return mod_file
+
+
+def normalizes(args):
+    # Normalizing is the default action if no other action is given.
+    return (args.normalize or args.rates[2] == 10 or
+            (not args.info and not args.trim and not args.speed and not args.audio))  # noqa: E501
+
+
+def set_segments(args, task):
+    # Limit task to the parts of its input that aren't dead air.
+    if not args.cut_silence:
+        return
+    if not task.media_in.has_audio:
+        print(f"Can't detect silence without audio: {task.infile}")
+        return
+    segments = analysis.find_kept_segments(
+        task.infile,
+        task.media_in.duration,
+        min_gap=args.min_silence,
+        padding=args.cut_padding,
+        check_video=args.cut_still and task.media_in.has_video,
+    )
+    if config.VERBOSE:
+        print(f"keeping segments: {segments}")
+    if not segments:
+        print(f"Warning: not cutting silence; the whole file is dead air: {task.infile}")  # noqa: E501
+        return
+    if len(segments) == 1 and segments[0] == (0, round(float(task.media_in.duration), 3)):  # noqa: E501
+        # Nothing to cut.
+        return
+    task.segments = segments
+
+
+def run_job(job_args, input_file, progress_callback=None, threads=None):
+    """
+    Run a job received from a coordinator; used by distributed workers.
+    """
+    args = get_parser().parse_args([])
+    for k, v in job_args.items():
+        setattr(args, k, v)
+    args.rates = tuple(args.rates)
+    args.file = [str(input_file)]
+    args.serve = None
+    args.worker = None
+    args.command = False
+    args.info = False
+    input_file = validate_file(input_file)
+    if not input_file:
+        return None
+    journal = Journal()
+    output = process_file(
+        args,
+        input_file,
+        progress_callback=progress_callback,
+        threads=threads,
+        journal=journal,
+    )
+    if journal.failures:
+        # Report verification problems to the coordinator.
+        raise RuntimeError('; '.join(
+            p for e in journal.failures for p in e.get('problems')
+        ))
+    return output
+
+
+def join_files(args, journal=None):
+    medias = []
+    for input_file_string in args.file:
+        input_file = validate_file(input_file_string)
+        if not input_file:
+            print(f"Skipped invalid input file: {input_file_string}")
+            continue
+        medias.append(MediaObject(input_file))
+    if len(medias) < 2:
+        print("Error: at least 2 valid files are needed to join")
+        sys.exit(1)
+    task = SqueezeTask(args=args, media_in=medias[0])
+    task.journal = journal
+    return task.join(medias[1:])
+
+
 def main():
-    args = get_parser().parse_args()
+    parser = get_parser()
+    args = parser.parse_args()
     if args.version:
         print(config.VERSION)
         sys.exit()
@@ -116,68 +412,102 @@ def main():
         config.VERBOSE = True
     if args.debug:
         config.DEBUG = True
+    if args.cut_silence and (args.join or args.info or not (args.audio or normalizes(args))):  # noqa: E501
+        parser.error("--cut-silence only applies when normalizing (-n) or exporting audio (-a)")  # noqa: E501
+    if args.cut_still and not args.cut_silence:
+        parser.error("--cut-still requires --cut-silence")
+    if args.join and (args.audio or args.trim or args.speed or args.info or args.jobs != 1):  # noqa: E501
+        parser.error("--join can't be combined with -a, -k, -s, -i or -j")
+    if args.serve and (args.join or args.worker):
+        parser.error("--serve can't be combined with --join or --worker")
+
+    # Limit resources used by this process and its ffmpeg children.
+    try:
+        governor = Governor.from_args(args)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        governor.apply()
+    except OSError as e:
+        print(f"Error: failed to limit resources: {e}")
+        sys.exit(1)
 
+    if args.http_cache:
+        # Serve http(s) inputs to ffmpeg through a local read-through cache.
+        remote.start_chunk_cache()
+
+    if args.worker:
+        # Pull jobs from a coordinator until its queue is empty.
+        worker = Worker(
+            args.worker,
+            run_job=partial(run_job, threads=governor.threads_per_job(1)),
+        )
+        try:
+            worker.run()
+        except OSError as e:
+            print(f"Error: connection to coordinator at {args.worker} failed: {e}")  # noqa: E501
+            sys.exit(1)
+        sys.exit()
+
+    journal = Journal(args.journal)
+    if args.join:
+        join_files(args, journal=journal)
+        journal.show_summary()
+        sys.exit(1 if journal.failures else 0)
+
+    jobs = []
     for input_file_string in args.file:
         # Validate input_file.
         input_file = validate_file(input_file_string)
         if args.verbose:
             print(f"input file: {input_file}")
-        mod_file = Path()
-        # mod_file_prev = Path()
         if not input_file:
             print(f"Skipped invalid input file: {input_file_string}")
             continue
-        media_in = MediaObject(input_file)
-        task = SqueezeTask(args=args, media_in=media_in)
-
-        if args.experimental:
-            # Try out new, experimental features.
-            task.action = 'trim'
-            task.setup()
-            mod_file = task.run()
-            sys.exit()
-
-        if args.info:
-            # Show the video file info.
-            media_in = MediaObject(input_file)
-            media_in.show_properties()
-            continue
+        jobs.append(input_file)
+
+    if not args.serve and governor.max_jobs == 1:
+        for input_file in jobs:
+            process_file(
+                args,
+                input_file,
+                threads=governor.threads_per_job(1),
+                journal=journal,
+            )
+    elif not args.serve:
+        # Run several files at once; progress bars would overwrite each
+        # other, so only report finished files.
+        def process_quietly(input_file, threads):
+            output = process_file(
+                args,
+                input_file,
+                progress_callback=lambda p: None,
+                threads=threads,
+                journal=journal,
+            )
+            print(f"Finished: {output}")
+            return output
+        governor.run(process_quietly, jobs)
+
+    if not args.serve and (len(jobs) > 1 or args.verify):
+        journal.show_summary()
+
+    if args.serve:
+        job_args = {
+            k: v for k, v in vars(args).items()
+            if k not in ['file', 'serve', 'worker', 'upload', 'jobs', 'cpu_quota', 'cpus', 'nice', 'ionice', 'journal']  # noqa: E501
+        }
+        coordinator = Coordinator(
+            args.serve,
+            [{'file': str(f), 'args': job_args} for f in jobs],
+            upload=args.upload,
+            journal=journal,
+        )
+        coordinator.run()
+        coordinator.show_summary()
 
-        if args.trim:
-            # Trim the file using given timestamps.
-            task.trim()
-
-        if args.speed:
-            # Use mod_file from previous step as input_file if it exists.
-            if mod_file.is_file():
-                input_file = mod_file
-                media_in = MediaObject(input_file)
-                task = SqueezeTask(args=args, media_in=media_in)
-                # mod_file_prev = mod_file
-            # Attempt to change the playback speed of all passed video files.
-            mod_file = task.change_speed()
-
-        if args.audio:
-            # Use mod_file from previous step as input_file if it exists.
-            if mod_file.is_file():
-                input_file = mod_file
-                media_in = MediaObject(input_file)
-                task = SqueezeTask(args=args, media_in=media_in)
-                task.media_out.suffix = '.mp3'
-                # mod_file_prev = mod_file
-            # Convert file(s) to normalized MP3.
-            mod_file = task.export_audio()
-
-        if (args.normalize or args.rates[2] == 10 or
-                (not args.info and not args.trim and not args.speed and not args.audio)):  # noqa: E501
-            # Use mod_file from previous step as input_file if it exists.
-            if mod_file.is_file():
-                input_file = mod_file
-                media_in = MediaObject(input_file)
-                task = SqueezeTask(args=args, media_in=media_in)
-                # mod_file_prev = mod_file
-            # Attempt to normalize all passed files.
-            task.normalize()
+    if journal.failures:
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -1,4 +1,8 @@
+import os
+from pathlib import Path
+
 DEBUG = False
 VERBOSE = False
 VERSION = '1.0.0'
 FFMPEG_EXPERIMENTAL = False
+CACHE_DIR = Path(os.getenv('XDG_CACHE_HOME', '~/.cache')).expanduser() / 'squeeze-vid'  # noqa: E501
@@ -0,0 +1,385 @@
+import json
+import os
+import shutil
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from . import config
+from .util import get_local_path
+
+HEARTBEAT_INTERVAL = 5  # seconds between worker heartbeats
+HEARTBEAT_TOLERANCE = 3  # missed heartbeats before a worker is considered dead
+MAX_ATTEMPTS = 3  # times a job is handed out before it's marked as failed
+CONNECT_ATTEMPTS = 10  # times a worker tries to reach the coordinator
+
+
+def parse_address(address, default_host='127.0.0.1'):
+    """
+    Return (family, address) for "[HOST]:PORT" or "unix:PATH" strings.
+    """
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    if '/' in address:
+        return socket.AF_UNIX, address
+    host, _, port = address.rpartition(':')
+    if not host:
+        host = default_host
+    return socket.AF_INET, (host, int(port))
+
+
+def send_message(wfile, message, lock=None):
+    data = json.dumps(message).encode() + b'\n'
+    if lock is None:
+        wfile.write(data)
+        wfile.flush()
+        return
+    with lock:
+        wfile.write(data)
+        wfile.flush()
+
+
+def recv_message(rfile):
+    line = rfile.readline()
+    if not line:
+        return None  # connection closed
+    return json.loads(line)
+
+
+def send_file(wfile, path):
+    with open(path, 'rb') as f:
+        shutil.copyfileobj(f, wfile)
+    wfile.flush()
+
+
+def recv_file(rfile, size, path):
+    with open(path, 'wb') as f:
+        remaining = size
+        while remaining > 0:
+            chunk = rfile.read(min(remaining, 1024*1024))
+            if not chunk:
+                raise ConnectionError("connection closed during file transfer")  # noqa: E501
+            f.write(chunk)
+            remaining -= len(chunk)
+
+
+class Coordinator():
+    """
+    Hold a queue of jobs and hand them out to connected workers.
+    """
+    def __init__(self, address, jobs, upload=False,
+                 heartbeat=HEARTBEAT_INTERVAL, max_attempts=MAX_ATTEMPTS,
+                 journal=None):
+        self.address = address
+        # Without a host, listen on all interfaces so remote workers can
+        # connect.
+        self.family, self.server_address = parse_address(address, '')
+        self.upload = upload
+        self.heartbeat = heartbeat
+        self.max_attempts = max_attempts
+        self.journal = journal
+        self.jobs = {}
+        for i, job in enumerate(jobs):
+            job['id'] = i
+            job['attempts'] = 0
+            job['status'] = 'pending'
+            job['output'] = None
+            job['worker'] = None
+            job['error'] = None
+            self.jobs[i] = job
+        self.pending = deque(self.jobs.keys())
+        self.in_flight = set()
+        self.condition = threading.Condition()
+        self.server = None
+
+    @property
+    def finished(self):
+        return not self.pending and not self.in_flight
+
+    def next_job(self, worker):
+        """
+        Block until a job is available; return None once all jobs are done.
+        """
+        with self.condition:
+            while not self.pending and self.in_flight:
+                self.condition.wait()
+            if not self.pending:
+                return None
+            job = self.jobs[self.pending.popleft()]
+            job['attempts'] += 1
+            job['status'] = 'running'
+            job['worker'] = worker
+            self.in_flight.add(job['id'])
+            if config.VERBOSE:
+                print(f"job {job['id']} -> {worker}: {job['file']}")
+            return job
+
+    def requeue(self, job_id):
+        with self.condition:
+            if job_id not in self.in_flight:
+                return
+            self.in_flight.discard(job_id)
+            job = self.jobs[job_id]
+            if job['attempts'] >= self.max_attempts:
+                job['status'] = 'failed'
+                print(f"Job failed after {job['attempts']} attempts: {job['file']}")  # noqa: E501
+                self._record(job)
+            else:
+                job['status'] = 'pending'
+                self.pending.appendleft(job_id)
+                print(f"Re-queued job from {job['worker']}: {job['file']}")
+            self.condition.notify_all()
+
+    def finish(self, job_id, ok, output=None, error=None):
+        if not ok:
+            self.jobs[job_id]['error'] = error
+            self.requeue(job_id)
+            return
+        with self.condition:
+            self.in_flight.discard(job_id)
+            job = self.jobs[job_id]
+            job['status'] = 'done'
+            job['output'] = output
+            print(f"Finished on {job['worker']}: {output}")
+            self._record(job)
+            self.condition.notify_all()
+
+    def _record(self, job):
+        if self.journal is None:
+            return
+        self.journal.record(
+            action='job',
+            input=job['file'],
+            output=job['output'],
+            ok=job['status'] == 'done',
+            attempts=job['attempts'],
+            worker=job['worker'],
+            problems=[job['error']] if job['error'] else [],
+        )
+
+    def progress(self, job_id, percent):
+        if config.VERBOSE:
+            print(f"job {job_id}: {int(percent):>3}%")
+
+    def start(self):
+        if self.family == socket.AF_UNIX:
+            Path(self.server_address).unlink(missing_ok=True)
+            server_class = _UnixCoordinatorServer
+        else:
+            server_class = _TCPCoordinatorServer
+        self.server = server_class(self.server_address, _CoordinatorHandler)
+        self.server.coordinator = self
+        self.server_thread = threading.Thread(
+            target=self.server.serve_forever,
+            daemon=True,
+        )
+        self.server_thread.start()
+        if self.family == socket.AF_INET:
+            # Record actual port in case port 0 was requested.
+            self.server_address = self.server.server_address
+        print(f"Serving {len(self.jobs)} job(s) at {self.address}")
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.family == socket.AF_UNIX:
+            Path(self.server_address).unlink(missing_ok=True)
+
+    def run(self):
+        if self.server is None:
+            self.start()
+        try:
+            with self.condition:
+                while not self.finished:
+                    self.condition.wait()
+        finally:
+            self.stop()
+
+    def show_summary(self):
+        for job in self.jobs.values():
+            output = job['output'] if job['output'] else job['file']
+            print(f"{job['status']:<8} {output}")
+            if job['status'] != 'done' and job['error']:
+                print(f"           {job['error']}")
+
+
+class _CoordinatorHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        coordinator = self.server.coordinator
+        # A silent worker is considered dead after a few missed heartbeats.
+        self.request.settimeout(coordinator.heartbeat * HEARTBEAT_TOLERANCE)
+        worker = str(self.client_address) if self.client_address else 'worker'
+        job = None
+        try:
+            while True:
+                message = recv_message(self.rfile)
+                if message is None:
+                    break
+                kind = message.get('type')
+                if kind == 'hello':
+                    worker = message.get('worker', worker)
+                elif kind == 'heartbeat':
+                    continue
+                elif kind == 'request':
+                    # Don't time out while the worker waits for a job.
+                    self.request.settimeout(None)
+                    job = coordinator.next_job(worker)
+                    self.request.settimeout(coordinator.heartbeat * HEARTBEAT_TOLERANCE)  # noqa: E501
+                    if job is None:
+                        send_message(self.wfile, {'type': 'done'})
+                        break
+                    self._send_job(job, coordinator.upload)
+                elif kind == 'progress':
+                    coordinator.progress(message.get('id'), message.get('percent', 0))  # noqa: E501
+                elif kind == 'result':
+                    output = self._receive_output(job, message)
+                    coordinator.finish(
+                        job['id'],
+                        message.get('ok'),
+                        output,
+                        message.get('error'),
+                    )
+                    job = None
+        except (OSError, ValueError) as e:
+            # Includes socket timeouts and broken connections.
+            if config.VERBOSE:
+                print(f"Lost worker {worker}: {e}")
+        finally:
+            if job is not None:
+                coordinator.requeue(job['id'])
+
+    def _send_job(self, job, upload):
+        message = {
+            'type': 'job',
+            'id': job['id'],
+            'file': job['file'],
+            'args': job['args'],
+        }
+        # Remote (URL) inputs are read by the worker directly.
+        upload = upload and Path(job['file']).is_file()
+        if upload:
+            message['size'] = os.path.getsize(job['file'])
+        send_message(self.wfile, message)
+        if upload:
+            send_file(self.wfile, job['file'])
+
+    def _receive_output(self, job, message):
+        output = message.get('output')
+        if not message.get('ok') or message.get('size') is None:
+            return output
+        # Uploaded result is saved next to the original input file.
+        output = get_local_path(job['file']).parent / Path(output).name
+        recv_file(self.rfile, message.get('size'), output)
+        return str(output)
+
+
+class _TCPCoordinatorServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _UnixCoordinatorServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class Worker():
+    """
+    Pull jobs from a coordinator, run them, and report the results.
+    """
+    def __init__(self, address, run_job, heartbeat=HEARTBEAT_INTERVAL,
+                 name=None):
+        self.address = address
+        self.family, self.server_address = parse_address(address)
+        self.run_job = run_job
+        self.heartbeat = heartbeat
+        self.name = name if name else f"{socket.gethostname()}:{os.getpid()}"
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.sock = None
+        self.jobs_done = 0
+
+    def connect(self):
+        for i in range(CONNECT_ATTEMPTS):
+            try:
+                self.sock = socket.socket(self.family, socket.SOCK_STREAM)
+                self.sock.connect(self.server_address)
+                break
+            except OSError:
+                self.sock.close()
+                if i == CONNECT_ATTEMPTS - 1:
+                    raise
+                time.sleep(1)
+        self.rfile = self.sock.makefile('rb')
+        self.wfile = self.sock.makefile('wb')
+        send_message(self.wfile, {'type': 'hello', 'worker': self.name}, self.lock)  # noqa: E501
+
+    def run(self):
+        self.connect()
+        beat = threading.Thread(target=self._send_heartbeats, daemon=True)
+        beat.start()
+        try:
+            while True:
+                send_message(self.wfile, {'type': 'request'}, self.lock)
+                message = recv_message(self.rfile)
+                if message is None or message.get('type') == 'done':
+                    break
+                if message.get('type') == 'job':
+                    self._process(message)
+        finally:
+            self.stopped.set()
+            self.sock.close()
+        print(f"Worker {self.name} finished {self.jobs_done} job(s).")
+
+    def _process(self, job):
+        job_id = job.get('id')
+        last = [-1]
+
+        def on_progress(percent):
+            # Only send updates when the whole-number percentage changes.
+            if int(percent) == last[0]:
+                return
+            last[0] = int(percent)
+            message = {'type': 'progress', 'id': job_id, 'percent': percent}
+            send_message(self.wfile, message, self.lock)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_file = job.get('file')
+            if job.get('size') is not None:
+                input_file = Path(tmpdir) / Path(job.get('file')).name
+                recv_file(self.rfile, job.get('size'), input_file)
+            error = None
+            try:
+                output = self.run_job(job.get('args'), input_file, on_progress)
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+                output = None
+                error = str(e)
+            ok = isinstance(output, Path) and output.is_file()
+            result = {
+                'type': 'result',
+                'id': job_id,
+                'ok': ok,
+                'output': str(output) if ok else None,
+                'error': error,
+            }
+            if ok and job.get('size') is not None:
+                # Send output back to coordinator.
+                result['size'] = output.stat().st_size
+                with self.lock:
+                    send_message(self.wfile, result)
+                    send_file(self.wfile, output)
+            else:
+                send_message(self.wfile, result, self.lock)
+        if ok:
+            self.jobs_done += 1
+
+    def _send_heartbeats(self):
+        while not self.stopped.wait(self.heartbeat):
+            try:
+                send_message(self.wfile, {'type': 'heartbeat'}, self.lock)
+            except (OSError, ValueError):
+                break
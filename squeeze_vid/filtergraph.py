@@ -0,0 +1,106 @@
+# Filters in a chain are ordered by cost: cheap filters that drop or retime
+# frames run before expensive per-frame filters like scale or denoise, so
+# frames that are thrown away are never scaled. Lower numbers run first;
+# filters with the same priority keep the order in which they were added.
+FILTER_PRIORITY = {
+    # Drop frames/samples outside of kept segments.
+    'select': 0,
+    'aselect': 0,
+    'trim': 0,
+    'atrim': 0,
+    # Retime remaining frames.
+    'setpts': 1,
+    'asetpts': 1,
+    # Reduce frame rate.
+    'fps': 2,
+    'decimate': 2,
+    'mpdecimate': 2,
+}
+DEFAULT_PRIORITY = 10  # scale, denoise, pad, etc.
+
+
+def escape_option(value):
+    """
+    Escape a filter option value (1st level: ' \\ :).
+    """
+    value = str(value)
+    for c in ['\\', "'", ':']:
+        value = value.replace(c, f"\\{c}")
+    return value
+
+
+def escape_graph(text):
+    """
+    Escape a filter description for use in a filtergraph (2nd level).
+    """
+    for c in ['\\', "'", '[', ']', ',', ';']:
+        text = text.replace(c, f"\\{c}")
+    return text
+
+
+class Filter():
+    def __init__(self, name, *args, priority=None, **kwargs):
+        self.name = name
+        self.args = list(args)
+        self.kwargs = kwargs
+        if priority is None:
+            priority = FILTER_PRIORITY.get(name, DEFAULT_PRIORITY)
+        self.priority = priority
+
+    def __str__(self):
+        params = [escape_option(a) for a in self.args]
+        params.extend(f"{k}={escape_option(v)}" for k, v in self.kwargs.items())  # noqa: E501
+        if not params:
+            return self.name
+        return f"{self.name}={escape_graph(':'.join(params))}"
+
+
+class FilterChain():
+    """
+    Linear chain of filters with optional input and output pad labels.
+    """
+    def __init__(self, inputs=None, outputs=None):
+        self.filters = []
+        self.inputs = list(inputs) if inputs else []
+        self.outputs = list(outputs) if outputs else []
+
+    def add(self, name, *args, **kwargs):
+        f = Filter(name, *args, **kwargs)
+        self.filters.append(f)
+        return f
+
+    def ordered(self):
+        return sorted(self.filters, key=lambda f: f.priority)
+
+    def __bool__(self):
+        return len(self.filters) > 0
+
+    def __str__(self):
+        inputs = ''.join(f"[{i}]" for i in self.inputs)
+        outputs = ''.join(f"[{o}]" for o in self.outputs)
+        filters = ','.join(str(f) for f in self.ordered())
+        return f"{inputs}{filters}{outputs}"
+
+
+class FilterGraph():
+    """
+    Set of labeled filter chains for use with -filter_complex.
+    """
+    def __init__(self):
+        self.chains = []
+
+    def add_chain(self, inputs=None, outputs=None):
+        chain = FilterChain(inputs=inputs, outputs=outputs)
+        self.chains.append(chain)
+        return chain
+
+    @property
+    def outputs(self):
+        """
+        Return output labels that aren't consumed by another chain.
+        """
+        consumed = {i for c in self.chains for i in c.inputs}
+        return [o for c in self.chains for o in c.outputs if o not in consumed]  # noqa: E501
+
+    def __str__(self):
+        return ';'.join(str(c) for c in self.chains if c)
@@ -0,0 +1,181 @@
+import os
+import shutil
+import subprocess
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+
+from . import config
+
+MIN_THREADS_PER_JOB = 2  # fewer threads per encode isn't worth a new job
+MIN_FREE_MEM = 1024 * 1024 * 1024  # bytes kept free for other services
+LOAD_HIGH = 1.0  # load per budgeted CPU above which concurrency is reduced
+LOAD_LOW = 0.75  # load per budgeted CPU below which concurrency can grow
+POLL_INTERVAL = 5  # seconds between load checks while jobs are running
+SETTLE_TIME = 30  # seconds for load average to reflect a concurrency change
+IONICE_CLASSES = {'realtime': 1, 'best-effort': 2, 'idle': 3}
+
+
+def parse_cpu_list(cpus):
+    """
+    Return sorted list of CPU ids from a string like "0-3,6".
+    """
+    ids = set()
+    for part in cpus.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-')
+            ids.update(range(int(first), int(last) + 1))
+        else:
+            ids.add(int(part))
+    return sorted(ids)
+
+
+def get_free_memory():
+    """
+    Return available memory in bytes, or None if it can't be determined.
+    """
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class Governor():
+    """
+    Decide how many jobs run at once and how many threads each one uses,
+    based on a CPU budget and the current system load.
+    """
+    def __init__(self, jobs=1, cpu_quota=100, cpus=None, nice=None,
+                 ionice=None, min_free_mem=MIN_FREE_MEM):
+        available = sorted(os.sched_getaffinity(0))
+        if cpus:
+            # Ignore CPUs that don't exist or that this process can't use.
+            self.cpus = [c for c in parse_cpu_list(cpus) if c in available]
+            if not self.cpus:
+                raise ValueError(f"none of the given CPUs are available: {cpus}")  # noqa: E501
+        else:
+            self.cpus = available
+        self.cpu_quota = cpu_quota
+        self.budget = max(1, int(len(self.cpus) * cpu_quota / 100))
+        self.auto = jobs == 'auto'
+        if self.auto:
+            self.max_jobs = max(1, self.budget // MIN_THREADS_PER_JOB)
+        else:
+            self.max_jobs = max(1, int(jobs))
+        self.nice = nice
+        self.ionice = ionice
+        self.min_free_mem = min_free_mem
+        # Only set thread counts when resources are actually limited.
+        self.limited = bool(cpus) or cpu_quota < 100 or self.max_jobs > 1
+        self.allowed = None if self.auto else self.max_jobs
+        self.last_change = 0
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(
+            jobs=args.jobs,
+            cpu_quota=args.cpu_quota,
+            cpus=args.cpus,
+            nice=args.nice,
+            ionice=args.ionice,
+        )
+
+    def apply(self):
+        """
+        Set CPU affinity and CPU/IO priority of this process; ffmpeg child
+        processes inherit them.
+        """
+        if self.cpus != sorted(os.sched_getaffinity(0)):
+            os.sched_setaffinity(0, self.cpus)
+        if self.nice is not None:
+            os.setpriority(os.PRIO_PROCESS, 0, self.nice)
+        if self.ionice is not None:
+            self._set_ionice()
+
+    def _set_ionice(self):
+        io_class, _, level = self.ionice.partition(':')
+        io_class = IONICE_CLASSES.get(io_class, io_class)
+        command = ['ionice', '-c', str(io_class)]
+        if level:
+            command.extend(['-n', level])
+        command.extend(['-p', str(os.getpid())])
+        if not shutil.which('ionice'):
+            print("Warning: ionice not found; IO priority unchanged.")
+            return
+        try:
+            subprocess.run(command, check=True)
+        except subprocess.CalledProcessError as e:
+            print(f"Warning: failed to set IO priority: {e}")
+
+    def threads_per_job(self, jobs=None):
+        """
+        Return encoder thread count for each of the given concurrent jobs, or
+        None to let ffmpeg decide.
+        """
+        if not self.limited:
+            return None
+        jobs = jobs if jobs else self.allowed
+        return max(1, self.budget // max(1, jobs))
+
+    def allowed_jobs(self, running):
+        """
+        Return number of jobs that may run now, scaling up or down by one
+        according to load average and free memory.
+        """
+        if not self.auto:
+            return self.max_jobs
+        now = time.monotonic()
+        load = os.getloadavg()[0]
+        if self.allowed is None:
+            # Start with as many jobs as the currently idle budget allows.
+            idle = max(0, self.budget - load)
+            self.allowed = min(self.max_jobs, max(1, int(idle // MIN_THREADS_PER_JOB)))  # noqa: E501
+            self.last_change = now
+            return self.allowed
+        if now - self.last_change < SETTLE_TIME:
+            # Load average lags; wait for it to reflect the last change.
+            return self.allowed
+        load = load / self.budget
+        free_mem = get_free_memory()
+        low_mem = free_mem is not None and free_mem < self.min_free_mem
+        previous = self.allowed
+        if load > LOAD_HIGH or low_mem:
+            self.allowed = max(1, min(self.allowed, running) - 1)
+        elif load < LOAD_LOW and running >= self.allowed:
+            self.allowed = min(self.max_jobs, self.allowed + 1)
+        if self.allowed != previous:
+            self.last_change = now
+        if config.VERBOSE:
+            print(f"load per CPU: {load:.2f}; allowed jobs: {self.allowed}")
+        return self.allowed
+
+    def run(self, func, items):
+        """
+        Call func(item, threads) for each item, running as many at once as
+        currently allowed; return results in order of completion.
+        """
+        results = []
+        queue = deque(items)
+        running = set()
+        with ThreadPoolExecutor(max_workers=self.max_jobs) as executor:
+            while queue or running:
+                allowed = self.allowed_jobs(len(running))
+                while queue and (not running or len(running) < allowed):
+                    threads = self.threads_per_job(allowed)
+                    running.add(executor.submit(func, queue.popleft(), threads))  # noqa: E501
+                done, running = wait(
+                    running,
+                    timeout=POLL_INTERVAL,
+                    return_when=FIRST_COMPLETED,
+                )
+                results.extend(f.result() for f in done)
+        return results
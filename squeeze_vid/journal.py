@@ -0,0 +1,37 @@
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+
+
+class Journal():
+    """
+    Record the outcome of each task, optionally appending JSON lines to a
+    journal file, and summarize them at the end of a batch.
+    """
+    def __init__(self, path=None):
+        self.path = Path(path).expanduser() if path else None
+        self.entries = []
+        self.lock = threading.Lock()
+
+    @property
+    def failures(self):
+        return [e for e in self.entries if not e.get('ok')]
+
+    def record(self, **entry):
+        entry['time'] = datetime.now().isoformat(timespec='seconds')
+        with self.lock:
+            self.entries.append(entry)
+            if self.path is not None:
+                with self.path.open('a') as f:
+                    f.write(json.dumps(entry, default=str) + '\n')
+
+    def show_summary(self):
+        if not self.entries:
+            return
+        print(f"\n{len(self.entries) - len(self.failures)} of {len(self.entries)} task(s) succeeded")  # noqa: E501
+        for e in self.entries:
+            status = 'ok' if e.get('ok') else 'FAILED'
+            print(f"{status:<8} {e.get('action')}: {e.get('output')}")
+            for p in e.get('problems', []):
+                print(f"           {p}")
@@ -2,6 +2,12 @@ import json
 import sys
 from ffmpeg import errors
 from ffmpeg import FFmpeg
+from pathlib import PurePosixPath
+
+from .remote import get_input_options
+from .remote import get_input_url
+from .remote import get_url_name
+from .remote import is_url
 
 
 class MediaObject():
@@ -20,6 +26,8 @@ class MediaObject():
         self.duration = None
         self.acodec = None
         self.abr = None
+        self.sample_rate = None
+        self.channels = None
         self.vcodec = None
         self.height = None
         self.width = None
@@ -36,8 +44,11 @@ class MediaObject():
         self.acodec_norm_a = 'mp3'
         self.format_norm_v = 'mp4'
         self.suffix_norm_v = '.mp4'
-        if self.file.is_file():
+        if is_url(self.file):
+            self.suffix = PurePosixPath(get_url_name(self.file)).suffix
+        elif self.file.is_file():
             self.suffix = self.file.suffix
+        if self.suffix is not None:
             self.format = self.suffix
             self.props = self._get_properties(str(self.file))
             self.astreams = self._get_astreams(self.props.get('streams'))
@@ -47,6 +58,8 @@ class MediaObject():
                     self.duration = float(self.astreams[0].get('duration'))
                 self.acodec = self.astreams[0].get('codec_name')
                 self.abr = int(self.astreams[0].get('bit_rate'))
+                self.sample_rate = int(self.astreams[0].get('sample_rate', 0))
+                self.channels = int(self.astreams[0].get('channels', 0))
             self.vstreams = self._get_vstreams(self.props.get('streams'))
             if len(self.vstreams) > 0:
                 self.has_video = True
@@ -90,7 +103,8 @@ class MediaObject():
             return 'placeholder'
         try:
             output = self.ffprobe.input(
-                infile,
+                get_input_url(infile),
+                get_input_options(infile),
                 show_streams=None,
                 print_format='json'
             ).execute()
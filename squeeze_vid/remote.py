@@ -0,0 +1,294 @@
+import base64
+import hashlib
+import http.client
+import http.server
+import json
+import re
+import threading
+import time
+from pathlib import PurePosixPath
+from urllib.parse import unquote
+from urllib.parse import urlsplit
+
+from . import config
+
+CHUNK_SIZE = 1024 * 1024  # bytes fetched from origin per request
+RETRIES = 3  # attempts per request before giving up
+RETRY_DELAY = 0.5  # seconds; doubled after each failed attempt
+TIMEOUT = 30  # seconds
+# Passed to ffmpeg/ffprobe for http(s) inputs: keep connections open between
+# range requests, allow seeking with range requests, and retry a bounded
+# number of times after network errors.
+HTTP_INPUT_OPTIONS = {
+    'multiple_requests': 1,
+    'seekable': 1,
+    'reconnect': 1,
+    'reconnect_on_network_error': 1,
+    'reconnect_delay_max': 4,
+}
+RE_RANGE = re.compile(r'bytes=(\d*)-(\d*)')
+
+_proxy = None
+
+
+def is_url(infile):
+    return isinstance(infile, str) and urlsplit(infile).scheme in ['http', 'https']  # noqa: E501
+
+
+def get_url_name(url):
+    """
+    Return the file name at the end of the URL's path.
+    """
+    return PurePosixPath(unquote(urlsplit(url).path)).name
+
+
+def get_input_options(infile):
+    """
+    Return ffmpeg input options for infile.
+    """
+    if not is_url(infile):
+        return {}
+    return dict(HTTP_INPUT_OPTIONS)
+
+
+def get_input_url(infile):
+    """
+    Return the URL ffmpeg should read infile from; http(s) inputs go through
+    the chunk cache if it has been started.
+    """
+    if _proxy is None or not is_url(infile):
+        return infile
+    return _proxy.url_for(infile)
+
+
+def get_remote_info(url):
+    """
+    Return dict with the remote file's size and validators.
+    """
+    if _proxy is not None:
+        return _proxy.cache.get_info(url)
+    return request_info(OriginConnections(), url)
+
+
+def request_info(connections, url):
+    status, headers, _ = connections.request('HEAD', url)
+    if status != 200:
+        raise OSError(f"HTTP {status}: {url}")
+    return {
+        'size': int(headers.get('Content-Length', 0)),
+        'etag': headers.get('ETag'),
+        'last_modified': headers.get('Last-Modified'),
+    }
+
+
+def start_chunk_cache(cache_dir=None):
+    """
+    Start local read-through cache for http(s) inputs.
+    """
+    global _proxy
+    if _proxy is None:
+        if cache_dir is None:
+            cache_dir = config.CACHE_DIR / 'chunks'
+        _proxy = CacheProxy(ChunkCache(cache_dir))
+        _proxy.start()
+    return _proxy
+
+
+class OriginConnections():
+    """
+    Reuse one connection per host and thread; retry failed requests.
+    """
+    def __init__(self, retries=RETRIES, timeout=TIMEOUT):
+        self.retries = retries
+        self.timeout = timeout
+        self.local = threading.local()
+        self.requests = 0  # requests made to origin, for testing/debugging
+
+    def _get_connection(self, parts):
+        if not hasattr(self.local, 'connections'):
+            self.local.connections = {}
+        key = (parts.scheme, parts.netloc)
+        conn = self.local.connections.get(key)
+        if conn is None:
+            if parts.scheme == 'https':
+                conn = http.client.HTTPSConnection(parts.netloc, timeout=self.timeout)  # noqa: E501
+            else:
+                conn = http.client.HTTPConnection(parts.netloc, timeout=self.timeout)  # noqa: E501
+            self.local.connections[key] = conn
+        return conn
+
+    def request(self, method, url, headers=None):
+        """
+        Return (status, headers, body) of the response to the request.
+        """
+        parts = urlsplit(url)
+        path = parts.path + (f"?{parts.query}" if parts.query else '')
+        delay = RETRY_DELAY
+        for attempt in range(1, self.retries + 1):
+            conn = self._get_connection(parts)
+            try:
+                self.requests += 1
+                conn.request(method, path, headers=headers or {})
+                response = conn.getresponse()
+                body = response.read()
+                if response.status >= 500:
+                    raise http.client.HTTPException(f"HTTP {response.status}")  # noqa: E501
+                return response.status, response.headers, body
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                if attempt == self.retries:
+                    raise
+                if config.VERBOSE:
+                    print(f"Retrying {method} {url}: {e}")
+                time.sleep(delay)
+                delay *= 2
+
+
+class ChunkCache():
+    """
+    Store fixed-size chunks of remote files on disk as they're read.
+    """
+    def __init__(self, cache_dir, chunk_size=CHUNK_SIZE, connections=None):
+        self.cache_dir = cache_dir
+        self.chunk_size = chunk_size
+        self.connections = connections if connections else OriginConnections()  # noqa: E501
+        self.lock = threading.Lock()
+        self.info = {}
+
+    def _get_dir(self, url):
+        return self.cache_dir / hashlib.sha256(url.encode()).hexdigest()
+
+    def get_info(self, url):
+        """
+        Return dict with the remote file's size and validators.
+        """
+        if url in self.info:
+            return self.info.get(url)
+        info = request_info(self.connections, url)
+        info_file = self._get_dir(url) / 'info.json'
+        if info_file.is_file() and json.loads(info_file.read_text()) != info:
+            # Remote file has changed; drop outdated chunks.
+            for f in self._get_dir(url).iterdir():
+                f.unlink()
+        info_file.parent.mkdir(parents=True, exist_ok=True)
+        info_file.write_text(json.dumps(info))
+        with self.lock:
+            self.info[url] = info
+        return info
+
+    def get_chunk(self, url, index):
+        # Validate cached chunks against the remote file once per session.
+        size = self.get_info(url).get('size')
+        chunk_file = self._get_dir(url) / f"{index}"
+        if chunk_file.is_file():
+            return chunk_file.read_bytes()
+        start = index * self.chunk_size
+        end = min(start + self.chunk_size, size) - 1
+        status, _, body = self.connections.request(
+            'GET',
+            url,
+            headers={'Range': f"bytes={start}-{end}"},
+        )
+        if status != 206:
+            raise OSError(f"HTTP {status}: range requests not supported: {url}")  # noqa: E501
+        # Write atomically so that concurrent readers never see part of it.
+        tmp_file = chunk_file.with_suffix(f".{threading.get_ident()}")
+        tmp_file.write_bytes(body)
+        tmp_file.replace(chunk_file)
+        return body
+
+    def iter_range(self, url, start, end):
+        """
+        Yield bytes from start to end (inclusive), one chunk at a time.
+        """
+        first = start // self.chunk_size
+        last = end // self.chunk_size
+        for index in range(first, last + 1):
+            chunk = self.get_chunk(url, index)
+            offset = index * self.chunk_size
+            yield chunk[max(start - offset, 0):end - offset + 1]
+
+
+class CacheProxy():
+    """
+    Local HTTP server that serves range requests for remote files from a
+    ChunkCache, so that ffmpeg and ffprobe can read them as usual.
+    """
+    def __init__(self, cache, host='127.0.0.1', port=0):
+        self.cache = cache
+        self.server = http.server.ThreadingHTTPServer((host, port), _CacheProxyHandler)  # noqa: E501
+        self.server.daemon_threads = True
+        self.server.cache = cache
+
+    def start(self):
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)  # noqa: E501
+        thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def url_for(self, url):
+        host, port = self.server.server_address[:2]
+        token = base64.urlsafe_b64encode(url.encode()).decode()
+        # Keep the file name at the end so ffmpeg can guess the format.
+        return f"http://{host}:{port}/{token}/{get_url_name(url)}"
+
+
+class _CacheProxyHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep connections open between requests
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def _respond(self, send_body):
+        cache = self.server.cache
+        try:
+            token = self.path.lstrip('/').split('/')[0]
+            url = base64.urlsafe_b64decode(token.encode()).decode()
+            size = cache.get_info(url).get('size')
+        except (ValueError, OSError) as e:
+            self.send_error(502, str(e))
+            return
+
+        start, end = 0, size - 1
+        status = 200
+        m = RE_RANGE.fullmatch(self.headers.get('Range', ''))
+        if m and (m.group(1) or m.group(2)):
+            if m.group(1):
+                start = int(m.group(1))
+                end = int(m.group(2)) if m.group(2) else size - 1
+            else:
+                # Suffix range: last N bytes.
+                start = max(size - int(m.group(2)), 0)
+            end = min(end, size - 1)
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{size}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            status = 206
+
+        self.send_response(status)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        if status == 206:
+            self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if not send_body or size == 0:
+            return
+        try:
+            # Chunks are only fetched as they're sent, so a reader that
+            # closes the connection early doesn't cause further downloads.
+            for data in cache.iter_range(url, start, end):
+                self.wfile.write(data)
+        except (ConnectionError, OSError):
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        if config.DEBUG:
+            super().log_message(format, *args)
@@ -1,12 +1,26 @@
 # import ffmpeg
 import os
+import tempfile
 from pathlib import Path
 
 from . import config
+from .filtergraph import FilterChain
+from .filtergraph import FilterGraph
 from .media import MediaObject
+from .remote import get_input_options
+from .remote import get_input_url
+from .remote import is_url
+from .util import get_local_path
 from .util import parse_timestamp
 from .util import print_command
 from .util import run_conversion
+from .verify import verify_output
+
+# Codecs that can be stream-copied into the normalized MP4 container.
+CONCAT_COPY_VCODECS = ['h264', 'hevc', 'av1', 'vp9', 'mpeg4']
+CONCAT_COPY_ACODECS = ['aac', 'mp3', 'ac3', 'opus', 'alac']
+# libvpx-vp9 speed/quality preset (0 to 8); threads are set with -threads.
+VP9_CPU_USED = 4
 
 
 class SqueezeTask():
@@ -17,13 +31,16 @@ class SqueezeTask():
             self.media_in = media_in
 
         self.infile = self.media_in.file
+        self.inputs = [(self.infile, get_input_options(self.infile))]  # (url, input options)  # noqa: E501
         self.media_out = self.media_in
-        self.media_out.file = Path(f"{self.media_in.file.parent}/{self.media_in.file.stem}_{self.media_out.suffix}")  # noqa: E501
+        local_file = get_local_path(self.media_in.file)
+        self.media_out.file = Path(f"{local_file.parent}/{local_file.stem}_{self.media_out.suffix}")  # noqa: E501
 
         self.filters = {
-            'audio': {},
-            'video': {},
+            'audio': FilterChain(),
+            'video': FilterChain(),
         }
+        self.filtergraph = None  # multi-input graph, e.g. for joining
 
         # Set attribs based on input args.
         self.media_out.abr_norm = self.args.rates[0]
@@ -42,6 +59,11 @@ class SqueezeTask():
 
         self.outfile_name_attribs = []  # strings appended to name stem
         self.action = None
+        self.normalized = False  # output size and fps are set by the task
+        self.journal = None
+        self.progress_callback = None
+        self.threads = None  # encoder threads; None lets ffmpeg decide
+        self.segments = None  # (start, end) spans of input to keep
         self.output_args = [self.media_out.file]
         self.output_kwargs = {
             "loglevel": "warning",
@@ -60,20 +82,46 @@ class SqueezeTask():
             self.media_out.crf = str(self.media_out.crf_svt_av1)
 
     def change_speed(self) -> Path|str:
+        self.action = 'change_speed'
         self.media_out.factor = float(self.args.speed)
         self._setprops_change_speed()
         return self._run_task()
 
     def export_audio(self) -> Path|str:
+        self.action = 'export_audio'
         self.media_out.suffix = self.media_out.suffix_norm_a
         self._setprops_export_audio()
+        if self.segments:
+            self._setprops_segments()
+        return self._run_task()
+
+    def join(self, media_others) -> Path|str:
+        self.action = 'join'
+        medias = [self.media_in, *media_others]
+        infiles = [self.infile, *(m.file for m in media_others)]
+        self.media_out.duration = sum(m.duration for m in medias)
+        self.outfile_name_attribs.append('joined')
+        if media_are_concat_compatible(medias):
+            # Losslessly concatenate with the concat demuxer.
+            list_file = self._setprops_join_copy(infiles)
+            try:
+                return self._run_task()
+            finally:
+                if not self.args.command:
+                    list_file.unlink(missing_ok=True)
+        # Re-encode once with the concat filter, applying normalize targets.
+        self._setprops_join_encode(infiles, medias)
         return self._run_task()
 
     def normalize(self) -> Path|str:
+        self.action = 'normalize'
         self._setprops_normalize()
+        if self.segments:
+            self._setprops_segments()
         return self._run_task()
 
     def trim(self) -> Path|str:
+        self.action = 'trim'
         self.media_out.endpoints = self.args.trim
         self._setprops_trim()
         return self._run_task()
@@ -89,9 +137,52 @@ class SqueezeTask():
         if self.args.command:
             # Print command if desired.
             return print_command(self.ffmpeg_output_stream)
-        run_conversion(self.media_out.ffmpeg, self.media_out.duration)
+        attempts = 0
+        while True:
+            attempts += 1
+            # Don't repeat progress output from a previous attempt.
+            self.media_out.ffmpeg.remove_all_listeners('progress')
+            ok = run_conversion(
+                self.media_out.ffmpeg,
+                self.media_out.duration,
+                progress_callback=self.progress_callback,
+            )
+            problems = [] if ok else ['ffmpeg exited with an error']
+            if ok and self.args.verify:
+                problems = verify_output(
+                    self.media_out.file,
+                    self._get_expected_props(),
+                    samples=self.args.verify,
+                )
+            if not problems or attempts > self.args.retries:
+                break
+            print(f"Conversion failed: {'; '.join(problems)}")
+            print(f"Retrying ({attempts}/{self.args.retries})")
+        for p in problems:
+            print(f"Error: {self.media_out.file}: {p}")
+        if self.journal is not None:
+            self.journal.record(
+                action=self.action,
+                input=str(self.infile),
+                output=str(self.media_out.file),
+                ok=not problems,
+                attempts=attempts,
+                problems=problems,
+            )
         return Path(self.media_out.file)
 
+    def _get_expected_props(self) -> dict:
+        expected = {
+            'duration': self.media_out.duration,
+            # ffmpeg maps at most one stream of each kind to the output.
+            'audio_streams': int(bool(self.media_out.has_audio)),
+            'video_streams': int(bool(self.media_out.has_video)),
+        }
+        if self.normalized and self.media_out.has_video:
+            expected['height'] = self.media_out.height
+            expected['fps'] = round(self.media_out.fps, 2)
+        return expected
+
     def _set_codecs(self) -> None:
         if self.media_out.has_audio and not self.output_kwargs.get('c:a'):
             self.output_kwargs['c:a'] = self.media_out.acodec
@@ -99,7 +190,8 @@ class SqueezeTask():
             self.output_kwargs['c:v'] = self.media_out.vcodec
 
     def _set_ffmpeg_command_args(self) -> None:
-        self.media_out.ffmpeg.input(self.infile)
+        for url, options in self.inputs:
+            self.media_out.ffmpeg.input(get_input_url(url), options)
         self.media_out.ffmpeg.option('y')
         # Modify command args according to variables.
         tile_col_exp = "1"  # 2**1 = 2 columns
@@ -111,7 +203,9 @@ class SqueezeTask():
         if config.FFMPEG_EXPERIMENTAL:
             self.output_kwargs["strict"] = "-2"
 
-        if self.media_out.has_video:
+        if self.threads and self.output_kwargs.get('c:v') != 'copy':
+            self.output_kwargs['threads'] = self.threads
+        if self.media_out.has_video and self.output_kwargs.get('c:v') != 'copy':  # noqa: E501
             self.output_kwargs['crf'] = self.media_out.crf
             if self.media_out.mode == 'CBR':
                 # Note: Some codecs require max vbr > target vbr.
@@ -125,33 +219,34 @@ class SqueezeTask():
                 self.output_kwargs['profile:v'] = "high"
             if self.media_out.vcodec == 'libsvtav1':
                 self.output_kwargs["svtav1-params"] = f"tile-columns={tile_col_exp}:tile-rows={tile_row_exp}:fast-decode=1"  # noqa: E501
+                if self.threads:
+                    # SVT-AV1 ignores -threads; limit its logical processors.
+                    self.output_kwargs["svtav1-params"] += f":lp={self.threads}"  # noqa: E501
             if self.media_out.vcodec == 'libvpx-vp9':
                 self.output_kwargs['b:v'] = "0"
                 self.output_kwargs["row-mt"] = "1"
-                self.output_kwargs["cpu-used"] = str(min(int(len(os.sched_getaffinity(0))), 8))  # available proc count, max=8  # noqa: E501
+                self.output_kwargs["cpu-used"] = str(VP9_CPU_USED)
                 self.output_kwargs["tile-columns"] = tile_col_exp
                 self.output_kwargs["tile-rows"] = tile_row_exp
 
     def _set_ffmpeg_command_stream(self) -> None:
         # Apply filters & create command stream.
-        if self.media_out.has_video:
-            filters_str = ''
-            for k, vs in self.filters.get('video').items():
-                f = f"{k}={':'.join((str(v) for v in vs))}"
-                if filters_str:
-                    f = f":{f}"
-                filters_str += f"{f}"
-            if filters_str:
-                self.output_kwargs['vf'] = filters_str
-        if self.media_out.has_audio:
-            filters_str = ''
-            for k, vs in self.filters.get('audio').items():
-                f = f"{k}={':'.join((str(v) for v in vs))}"
-                if filters_str:
-                    f = f":{f}"
-                filters_str += f"{f}"
-            if filters_str:
-                self.output_kwargs['af'] = filters_str
+        if self.filtergraph is not None:
+            # Append per-stream chains to the graph's outputs so that all
+            # filtering happens in a single -filter_complex.
+            for kind, label in [('video', 'v'), ('audio', 'a')]:
+                chain = self.filters.get(kind)
+                if chain and label in self.filtergraph.outputs:
+                    chain.inputs = [label]
+                    chain.outputs = [f"{label}out"]
+                    self.filtergraph.chains.append(chain)
+            self.output_kwargs['filter_complex'] = str(self.filtergraph)
+            self.output_kwargs['map'] = [f"[{o}]" for o in self.filtergraph.outputs]  # noqa: E501
+        else:
+            if self.media_out.has_video and self.filters.get('video'):
+                self.output_kwargs['vf'] = str(self.filters.get('video'))
+            if self.media_out.has_audio and self.filters.get('audio'):
+                self.output_kwargs['af'] = str(self.filters.get('audio'))
 
         specs_str = '_'.join(self.outfile_name_attribs)
         stem = self.media_out.file.stem.rstrip('_')  # removes extra '_' from above
@@ -175,8 +270,8 @@ class SqueezeTask():
 
     def _setprops_change_speed(self) -> None:
         # Add filters.
-        self.filters['audio']['atempo'] = [f"{str(self.media_out.factor)}"]
-        self.filters['video']['setpts'] = [f"{str(1 / self.media_out.factor)}*PTS"]  # noqa: E501
+        self.filters['audio'].add('atempo', self.media_out.factor)
+        self.filters['video'].add('setpts', f"{str(1 / self.media_out.factor)}*PTS")  # noqa: E501
         self.media_out.duration = self.media_in.duration / self.media_out.factor  # noqa: E501
         # Add attrib to final file name.
         self.outfile_name_attribs.append(f"{str(self.media_out.factor)}x")
@@ -190,20 +285,107 @@ class SqueezeTask():
         abitrate = round(self.media_out.abr/1000) if self.media_out.abr is not None else 0  # noqa: E501
         self.outfile_name_attribs.append(f"a{round(abitrate)}kbps")
 
+    def _setprops_join_copy(self, infiles) -> Path:
+        # Write concat demuxer list; single quotes must be escaped.
+        fd, list_file = tempfile.mkstemp(prefix='squeeze-vid_', suffix='.txt')  # noqa: E501
+        with os.fdopen(fd, 'w') as f:
+            for infile in infiles:
+                infile = str(get_input_url(infile)).replace("'", r"'\''")
+                f.write(f"file '{infile}'\n")
+        options = {'f': 'concat', 'safe': '0'}
+        if any(is_url(infile) for infile in infiles):
+            options['protocol_whitelist'] = 'file,http,https,tcp,tls'
+        self.inputs = [(list_file, options)]
+        if self.media_out.has_video:
+            self.media_out.format = self.media_out.format_norm_v
+            self.media_out.suffix = self.media_out.suffix_norm_v
+            self.output_kwargs['c:v'] = 'copy'
+        else:
+            self.media_out.format = self.media_out.format_norm_a
+            self.media_out.suffix = self.media_out.suffix_norm_a
+        if self.media_out.has_audio:
+            self.output_kwargs['c:a'] = 'copy'
+        return Path(list_file)
+
+    def _setprops_join_encode(self, infiles, medias) -> None:
+        self.inputs = [(infile, get_input_options(infile)) for infile in infiles]  # noqa: E501
+        if not all(m.has_audio for m in medias):
+            # The concat filter needs the same streams from every segment.
+            self.media_out.has_audio = False
+        if not all(m.has_video for m in medias):
+            self.media_out.has_video = False
+        # Note: media_out shares props with media_in until normalized.
+        w, h = medias[0].width, medias[0].height
+        self.media_out = normalize_stream_props(
+            self.media_in,
+            self.media_out
+        )
+        self.normalized = True
+        self.filtergraph = FilterGraph()
+        if self.media_out.has_video:
+            # Fit every segment into the first segment's normalized frame.
+            fps = round(self.media_out.fps, 2)
+            if w >= h:
+                h_out = self.media_out.height
+                w_out = round(self.media_out.height * w / h / 2) * 2
+            else:
+                w_out = self.media_out.height
+                h_out = round(self.media_out.height * h / w / 2) * 2
+            for i in range(len(medias)):
+                chain = self.filtergraph.add_chain([f"{i}:v:0"], [f"v{i}"])
+                chain.add('fps', fps)
+                chain.add('scale', w_out, h_out, force_original_aspect_ratio='decrease')  # noqa: E501
+                chain.add('pad', w_out, h_out, '(ow-iw)/2', '(oh-ih)/2')
+                chain.add('setsar', 1)
+            self.outfile_name_attribs.extend([
+                f"crf{self.media_out.crf}",
+                f"{fps}fps"
+            ])
+        if self.media_out.has_audio:
+            layout = 'mono' if medias[0].channels == 1 else 'stereo'
+            for i in range(len(medias)):
+                chain = self.filtergraph.add_chain([f"{i}:a:0"], [f"a{i}"])
+                chain.add('aresample', medias[0].sample_rate)
+                chain.add('aformat', channel_layouts=layout)
+            abitrate = round(self.media_out.abr/1000) if self.media_out.abr is not None else 0  # noqa: E501
+            self.outfile_name_attribs.append(f"a{abitrate}kbps")
+        segments = []
+        outputs = []
+        for i in range(len(medias)):
+            if self.media_out.has_video:
+                segments.append(f"v{i}")
+            if self.media_out.has_audio:
+                segments.append(f"a{i}")
+        if self.media_out.has_video:
+            outputs.append('v')
+        if self.media_out.has_audio:
+            outputs.append('a')
+        concat = self.filtergraph.add_chain(segments, outputs)
+        concat.add(
+            'concat',
+            n=len(medias),
+            v=int(bool(self.media_out.has_video)),
+            a=int(bool(self.media_out.has_audio)),
+        )
+
     def _setprops_normalize(self) -> None:
         # Normalize media_out properties.
         self.media_out = normalize_stream_props(
             self.media_in,
             self.media_out
         )
+        self.normalized = True
         # Add video filters: Define video max height.
         if self.media_out.has_video:
-            self.filters['video']['scale'] = [
+            self.filters['video'].add(
+                'scale',
                 "trunc(oh*a/2)*2",
-                rf"min({self.media_out.height}\,ih)",
-            ]
+                f"min({self.media_out.height},ih)",
+            )
+            # Reduce frame rate with a filter so that dropped frames are
+            # never scaled.
             fps = round(self.media_out.fps, 2)
-            self.output_kwargs['r'] = fps
+            self.filters['video'].add('fps', fps)
             self.outfile_name_attribs.extend([
                 f"crf{self.media_out.crf}",
                 f"{fps}fps"
@@ -212,16 +394,62 @@ class SqueezeTask():
             abitrate = round(self.media_out.abr/1000) if self.media_out.abr is not None else 0  # noqa: E501
             self.outfile_name_attribs.append(f"a{abitrate}kbps")
 
+    def _setprops_segments(self) -> None:
+        # Keep only the given segments and close the gaps between them.
+        between = '+'.join(f"between(t,{s},{e})" for s, e in self.segments)
+        offsets = []
+        position = 0.0
+        for s, e in self.segments:
+            if s > position:
+                offsets.append(f"gte(T,{s})*{round(s - position, 3)}")
+            position = e
+        shift = f"-({'+'.join(offsets)})/TB" if offsets else '-STARTPTS'
+        if self.media_out.has_video:
+            self.filters['video'].add('select', between)
+            self.filters['video'].add('setpts', f"PTS{shift}")
+        if self.media_out.has_audio:
+            self.filters['audio'].add('aselect', between)
+            self.filters['audio'].add('asetpts', f"PTS{shift}")
+        self.media_out.duration = sum(e - s for s, e in self.segments)
+        self.outfile_name_attribs.insert(0, 'cut')
+
     def _setprops_trim(self) -> None:
         self.media_out.endpoints = [parse_timestamp(e) for e in self.media_out.endpoints]  # noqa: E501
         self.media_out.duration = self.media_out.endpoints[1] - self.media_out.endpoints[0]  # noqa: E501
-        self.output_kwargs['ss'] = self.media_out.endpoints[0]
-        self.output_kwargs['to'] = self.media_out.endpoints[1]
+        # Seek in the input so that only the needed part is read; for remote
+        # input this means only the needed byte ranges are fetched.
+        self.inputs[0][1]['ss'] = self.media_out.endpoints[0]
+        self.inputs[0][1]['to'] = self.media_out.endpoints[1]
         if self.media_out.has_audio:
             self.output_kwargs['c:a'] = 'copy'
         self.outfile_name_attribs.append(f"{self.media_out.duration}s")
 
 
+def media_are_concat_compatible(medias):
+    """
+    Return True if all media can be joined by the concat demuxer without
+    re-encoding, i.e. they share streams, codecs, resolution, fps and audio
+    layout, and those codecs fit the normalized output container.
+    """
+    first = medias[0]
+    props = [
+        'has_audio', 'has_video',
+        'acodec', 'sample_rate', 'channels',
+        'vcodec', 'width', 'height', 'fps',
+    ]
+    for m in medias[1:]:
+        for p in props:
+            if getattr(m, p) != getattr(first, p):
+                if config.VERBOSE:
+                    print(f"Can't stream-copy {m.file}: {p} differs")
+                return False
+    if first.has_video:
+        return first.vcodec in CONCAT_COPY_VCODECS and (
+            not first.has_audio or first.acodec in CONCAT_COPY_ACODECS
+        )
+    return first.acodec == first.acodec_norm_a
+
+
 def normalize_stream_props(media_in, media_out):
     # Determine audio attributes for media_out.
     if media_out.has_audio:
@@ -3,9 +3,14 @@ from ffmpeg import FFmpegError, Progress
 from pathlib import Path
 
 from . import config
+from .remote import get_url_name
+from .remote import is_url
 
 
 def validate_file(input_file_string):
+    if is_url(input_file_string):
+        # Remote input is read directly by ffprobe/ffmpeg.
+        return input_file_string
     # Get full path to input file.
     #   .expanduser() expands out possible "~"
     #   .resolve() expands relative paths and symlinks
@@ -16,6 +21,16 @@ def validate_file(input_file_string):
     return input_file
 
 
+def get_local_path(infile):
+    """
+    Return local path used to name output files; outputs for remote inputs
+    are saved in the current directory.
+    """
+    if is_url(infile):
+        return Path.cwd() / get_url_name(infile)
+    return Path(infile)
+
+
 def parse_timestamp(timestamp):
     """
     Return timestamp string HH:MM:SS as a float of total seconds.
@@ -34,7 +49,7 @@ def print_command(stream):
     command = stream.arguments[1:]  # omit 'ffmpeg'
     # Add quotes around iffy command arg. options.
     for i, item in enumerate(command.copy()):
-        if item == '-filter_complex' or item == '-i':
+        if item in ['-filter_complex', '-vf', '-af', '-i']:
             command[i+1] = f"\"{command[i+1]}\""
     command[-1] = f"\"{command[-1]}\""  # outfile
     command_str = f"squeeze-vid.ffmpeg {' '.join(command)}\n"
@@ -42,7 +57,7 @@ def print_command(stream):
     return command_str
 
 
-def run_conversion(output_stream, duration):
+def run_conversion(output_stream, duration, progress_callback=None):
     duration = float(duration)
     if config.DEBUG:
         print(f"{duration=}")
@@ -79,11 +94,20 @@ def run_conversion(output_stream, duration):
         percent = progress.time.total_seconds() * 100 / duration
         if config.DEBUG or config.VERBOSE:
             print(progress)
+        if progress_callback is not None:
+            # Report progress to caller (e.g. distributed worker) instead.
+            progress_callback(percent)
+            return
         sys.stdout.write(get_progressbar(percent))
 
     try:
         output_stream.execute()
-        sys.stdout.write(get_progressbar(100)) # for a nice, cleann finish
-        print()
+        if progress_callback is not None:
+            progress_callback(100)
+        else:
+            sys.stdout.write(get_progressbar(100)) # for a nice, cleann finish
+            print()
+        return True
     except FFmpegError as e:
         print(f"{e.message}: {e.arguments}")
+        return False
@@ -0,0 +1,137 @@
+import json
+import random
+from concurrent.futures import ThreadPoolExecutor
+from ffmpeg import errors
+from ffmpeg import FFmpeg
+from pathlib import Path
+
+from . import config
+
+SAMPLES = 3  # number of windows decoded by default
+WINDOW = 2.0  # seconds decoded per window
+DURATION_TOLERANCE = 1.0  # seconds, or 2% of duration if larger
+FPS_TOLERANCE = 0.5
+HEIGHT_TOLERANCE = 2  # pixels; allows for rounding to even sizes
+
+
+def verify_output(outfile, expected, samples=SAMPLES, window=WINDOW):
+    """
+    Return list of problems found in outfile, compared with expected props;
+    an empty list means the output looks good.
+    """
+    outfile = Path(outfile)
+    if not outfile.is_file():
+        return ['output file is missing']
+    try:
+        probe = probe_file(outfile)
+    except errors.FFmpegError as e:
+        return [f"output can't be probed: {e.message}"]
+    problems = check_props(probe, expected)
+
+    duration = get_duration(probe)
+    if duration:
+        problems.extend(check_windows(outfile, duration, samples, window))
+    return problems
+
+
+def probe_file(infile):
+    output = FFmpeg(executable='ffprobe').input(
+        infile,
+        show_streams=None,
+        show_format=None,
+        print_format='json'
+    ).execute()
+    return json.loads(output)
+
+
+def get_duration(probe):
+    duration = probe.get('format', {}).get('duration')
+    return float(duration) if duration else None
+
+
+def check_props(probe, expected):
+    problems = []
+    streams = probe.get('streams', [])
+    astreams = [s for s in streams if s.get('codec_type') == 'audio']
+    vstreams = [s for s in streams if s.get('codec_type') == 'video']
+
+    for kind, found in [('audio', astreams), ('video', vstreams)]:
+        count = expected.get(f"{kind}_streams", 0)
+        if count and not found:
+            problems.append(f"{kind} stream is missing")
+        elif len(found) != count:
+            problems.append(f"{kind} streams: {len(found)}; expected {count}")
+
+    duration = get_duration(probe)
+    expected_duration = expected.get('duration')
+    if expected_duration:
+        tolerance = max(DURATION_TOLERANCE, 0.02 * expected_duration)
+        if duration is None:
+            problems.append('duration is unknown')
+        elif abs(duration - expected_duration) > tolerance:
+            problems.append(f"duration is {duration:.2f}s; expected {expected_duration:.2f}s")  # noqa: E501
+
+    if vstreams:
+        v = vstreams[0]
+        height = expected.get('height')
+        if height is not None:
+            # Accept expected height as either frame height or shortest side.
+            h, w = int(v.get('height', 0)), int(v.get('width', 0))
+            if min(abs(h - height), abs(min(h, w) - height)) > HEIGHT_TOLERANCE:  # noqa: E501
+                problems.append(f"height is {h}; expected {height}")
+        fps = expected.get('fps')
+        if fps is not None:
+            fpsn, fpsd = v.get('avg_frame_rate', '0/0').split('/')
+            fps_out = float(fpsn)/float(fpsd) if fpsd != '0' else 0
+            if abs(fps_out - fps) > FPS_TOLERANCE:
+                problems.append(f"frame rate is {fps_out:.2f}; expected {fps}")  # noqa: E501
+    return problems
+
+
+def check_windows(outfile, duration, samples=SAMPLES, window=WINDOW):
+    """
+    Decode randomly chosen short windows of outfile in parallel; return
+    list of decoding problems.
+    """
+    if samples < 1:
+        return []
+    window = min(window, duration)
+    starts = sorted(
+        round(random.uniform(0, duration - window), 2)
+        for i in range(samples)
+    )
+    with ThreadPoolExecutor(max_workers=samples) as executor:
+        results = executor.map(
+            lambda s: decode_window(outfile, s, window),
+            starts,
+        )
+    return [p for p in results if p]
+
+
+def decode_window(outfile, start, window):
+    """
+    Return a problem description if the window can't be cleanly decoded.
+    """
+    ffmpeg = (
+        FFmpeg()
+        .option('hide_banner')
+        .option('nostats')
+        .option('loglevel', 'error')
+        .option('xerror')
+        .input(outfile, ss=start, t=window, threads=1)
+        .output('-', f='null')
+    )
+    messages = []
+
+    @ffmpeg.on('stderr')
+    def on_stderr(line):
+        messages.append(line.strip())
+
+    if config.VERBOSE:
+        print(f"decode-testing {window}s at {start}s: {outfile}")
+    try:
+        ffmpeg.execute()
+    except errors.FFmpegError as e:
+        return f"decoding failed at {start}s: {e.message}"
+    if messages:
+        return f"decoding errors at {start}s: {messages[0]}"
@@ -0,0 +1,57 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from squeeze_vid import analysis
+from squeeze_vid.app import get_parser
+from squeeze_vid.app import set_segments
+
+SILENCEDETECT_LOG = [
+    "[silencedetect @ 0x5581] silence_start: 0",
+    "[silencedetect @ 0x5581] silence_end: 120.5 | silence_duration: 120.5",
+    "[silencedetect @ 0x5581] silence_start: 600.25",
+    "[silencedetect @ 0x5581] silence_end: 601.5 | silence_duration: 1.25",
+    "[silencedetect @ 0x5581] silence_start: 900",
+]
+
+
+class Analysis(unittest.TestCase):
+    def test__parse_intervals(self):
+        intervals = analysis.parse_intervals(
+            SILENCEDETECT_LOG,
+            analysis.RE_SILENCE_START,
+            analysis.RE_SILENCE_END,
+            1000,
+        )
+        self.assertEqual(intervals, [(0.0, 120.5), (600.25, 601.5), (900.0, 1000.0)])  # noqa: E501
+
+    def test__parse_black_intervals(self):
+        line = "[blackdetect @ 0x55] black_start:10 black_end:15.5 black_duration:5.5"  # noqa: E501
+        self.assertEqual(analysis.parse_black_intervals([line]), [(10.0, 15.5)])  # noqa: E501
+
+    def test__intersect_intervals(self):
+        silent = [(0, 10), (20, 30)]
+        still = [(5, 25)]
+        self.assertEqual(analysis.intersect_intervals(silent, still), [(5, 10), (20, 25)])  # noqa: E501
+
+    def test__invert_intervals(self):
+        dead = [(0.0, 120.5), (600.25, 601.5), (900.0, 1000.0)]
+        segments = analysis.invert_intervals(dead, 1000, min_gap=3, padding=0.5)  # noqa: E501
+        # Short pause is kept; no padding at the file's start or end.
+        self.assertEqual(segments, [(120.0, 900.5)])
+
+    def test__invert_no_dead_air(self):
+        self.assertEqual(analysis.invert_intervals([], 60), [(0.0, 60.0)])
+
+    def test__set_segments(self):
+        args = get_parser().parse_args(['--cut-silence'])
+        media_in = SimpleNamespace(has_audio=True, has_video=True, duration='1000.0')  # noqa: E501
+        for kept, expected in [
+            ([(0.0, 400.0), (500.0, 1000.0)], [(0.0, 400.0), (500.0, 1000.0)]),  # noqa: E501
+            ([(0.0, 1000.0)], None),  # no dead air
+            ([], None),  # only dead air
+        ]:
+            task = SimpleNamespace(infile='a.mp4', media_in=media_in, segments=None)  # noqa: E501
+            with patch('squeeze_vid.analysis.find_kept_segments', return_value=kept):  # noqa: E501
+                set_segments(args, task)
+            self.assertEqual(task.segments, expected)
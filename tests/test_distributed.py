@@ -0,0 +1,128 @@
+import socket
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from squeeze_vid import app
+from squeeze_vid.distributed import Coordinator
+from squeeze_vid.distributed import parse_address
+from squeeze_vid.distributed import recv_message
+from squeeze_vid.distributed import send_message
+from squeeze_vid.distributed import Worker
+
+
+def fake_run_job(job_args, input_file, progress_callback=None):
+    # Stand-in for an encode: write a small output file next to the input.
+    input_file = Path(input_file)
+    progress_callback(50)
+    output = input_file.with_stem(f"{input_file.stem}_{job_args.get('tag')}")
+    output.write_text(input_file.read_text().upper())
+    progress_callback(100)
+    return output
+
+
+class FakeTask():
+    # Stand-in for SqueezeTask: trim writes an output without running ffmpeg.
+    def __init__(self, args, media_in):
+        self.infile = Path(media_in)
+
+    def trim(self):
+        output = self.infile.with_stem(f"{self.infile.stem}_trim")
+        output.write_text(self.infile.read_text())
+        return output
+
+
+class Distributed(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.tmp = Path(self.tmpdir.name)
+        self.address = f"unix:{self.tmp / 'coordinator.sock'}"
+        self.infiles = []
+        for i in range(3):
+            infile = self.tmp / f"MVI_000{i}.txt"
+            infile.write_text(f"file {i}")
+            self.infiles.append(infile)
+
+    def _start_coordinator(self, upload=False, args=None):
+        args = args if args else {'tag': 'done'}
+        jobs = [{'file': str(f), 'args': args} for f in self.infiles]
+        coordinator = Coordinator(self.address, jobs, upload=upload, heartbeat=0.5)  # noqa: E501
+        coordinator.start()
+        thread = threading.Thread(target=coordinator.run, daemon=True)
+        thread.start()
+        return coordinator, thread
+
+    def _run_workers(self, count, run_job=fake_run_job):
+        workers = [
+            Worker(self.address, run_job=run_job, heartbeat=0.1, name=f"w{i}")  # noqa: E501
+            for i in range(count)
+        ]
+        threads = [threading.Thread(target=w.run) for w in workers]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=10)
+        return workers
+
+    def test__parse_address(self):
+        self.assertEqual(parse_address(':8500'), (socket.AF_INET, ('127.0.0.1', 8500)))  # noqa: E501
+        self.assertEqual(parse_address(':8500', ''), (socket.AF_INET, ('', 8500)))  # noqa: E501
+        self.assertEqual(parse_address('unix:/tmp/s.sock'), (socket.AF_UNIX, '/tmp/s.sock'))  # noqa: E501
+
+    def test__jobs_shared_filesystem(self):
+        coordinator, thread = self._start_coordinator()
+        workers = self._run_workers(2)
+        thread.join(timeout=10)
+
+        self.assertEqual(sum(w.jobs_done for w in workers), 3)
+        for job in coordinator.jobs.values():
+            self.assertEqual(job['status'], 'done')
+            self.assertTrue(Path(job['output']).is_file())
+
+    def test__jobs_upload(self):
+        coordinator, thread = self._start_coordinator(upload=True)
+        self._run_workers(1)
+        thread.join(timeout=10)
+
+        for infile in self.infiles:
+            outfile = infile.with_stem(f"{infile.stem}_done")
+            self.assertTrue(outfile.is_file())
+            self.assertEqual(outfile.read_text(), infile.read_text().upper())
+
+    @patch('squeeze_vid.app.MediaObject', new=lambda f: f)
+    @patch('squeeze_vid.app.SqueezeTask', new=FakeTask)
+    def test__trim_job_output(self):
+        args = {'trim': ['00:00:01', '00:00:05']}
+        coordinator, thread = self._start_coordinator(args=args)
+        workers = self._run_workers(1, run_job=app.run_job)
+        thread.join(timeout=10)
+
+        self.assertEqual(workers[0].jobs_done, 3)
+        for job in coordinator.jobs.values():
+            self.assertEqual(job['status'], 'done')
+            self.assertEqual(job['attempts'], 1)
+            self.assertTrue(job['output'].endswith('_trim.txt'))
+
+    def test__requeue_dead_worker(self):
+        coordinator, thread = self._start_coordinator()
+        # Take a job, then die without reporting a result.
+        family, address = parse_address(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.connect(address)
+        rfile = sock.makefile('rb')
+        wfile = sock.makefile('wb')
+        send_message(wfile, {'type': 'request'})
+        lost_job = recv_message(rfile)
+        sock.close()
+
+        self._run_workers(1)
+        thread.join(timeout=10)
+
+        job = coordinator.jobs[lost_job.get('id')]
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['attempts'], 2)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
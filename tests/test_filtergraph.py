@@ -0,0 +1,43 @@
+import unittest
+
+from squeeze_vid.filtergraph import escape_option
+from squeeze_vid.filtergraph import FilterChain
+from squeeze_vid.filtergraph import FilterGraph
+
+
+class Filtergraph(unittest.TestCase):
+    def test__chain_separator(self):
+        chain = FilterChain()
+        chain.add('atempo', 2.0)
+        chain.add('volume', 0.5)
+        self.assertEqual(str(chain), 'atempo=2.0,volume=0.5')
+
+    def test__cheap_filters_first(self):
+        chain = FilterChain()
+        chain.add('scale', 'trunc(oh*a/2)*2', 'min(720,ih)')
+        chain.add('fps', 25)
+        chain.add('setpts', '0.5*PTS')
+        expected = r'setpts=0.5*PTS,fps=25,scale=trunc(oh*a/2)*2:min(720\,ih)'
+        self.assertEqual(str(chain), expected)
+
+    def test__escape_option(self):
+        self.assertEqual(escape_option("drawtext's:text"), r"drawtext\'s\:text")  # noqa: E501
+
+    def test__graph_escaping(self):
+        chain = FilterChain()
+        chain.add('drawtext', text="a:b,[c]")
+        # Option level escapes ':'; graph level escapes the '\' it added too.
+        self.assertEqual(str(chain), r"drawtext=text=a\\:b\,\[c\]")
+
+    def test__complex_graph(self):
+        graph = FilterGraph()
+        for i in range(2):
+            graph.add_chain([f"{i}:a:0"], [f"a{i}"]).add('aresample', 48000)
+        graph.add_chain(['a0', 'a1'], ['a']).add('concat', n=2, v=0, a=1)
+        expected = (
+            '[0:a:0]aresample=48000[a0];'
+            '[1:a:0]aresample=48000[a1];'
+            '[a0][a1]concat=n=2:v=0:a=1[a]'
+        )
+        self.assertEqual(str(graph), expected)
+        self.assertEqual(graph.outputs, ['a'])
@@ -0,0 +1,54 @@
+import unittest
+from unittest.mock import patch
+
+from squeeze_vid import governor
+from squeeze_vid.governor import Governor
+
+
+class ResourceGovernor(unittest.TestCase):
+    def setUp(self):
+        # Pretend to run on an 8-CPU machine.
+        patcher = patch('os.sched_getaffinity', return_value=set(range(8)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test__parse_cpu_list(self):
+        self.assertEqual(governor.parse_cpu_list('0-3,6'), [0, 1, 2, 3, 6])
+
+    def test__unavailable_cpus_ignored(self):
+        g = Governor(jobs='auto', cpus='4-63')
+        self.assertEqual(g.cpus, [4, 5, 6, 7])
+        self.assertEqual(g.budget, 4)
+        self.assertEqual(g.max_jobs, 2)
+        with self.assertRaises(ValueError):
+            Governor(cpus='64-127')
+
+    def test__unlimited_threads(self):
+        self.assertIsNone(Governor().threads_per_job())
+
+    def test__threads_from_quota(self):
+        g = Governor(jobs=2, cpus='0-7', cpu_quota=50)
+        self.assertEqual(g.budget, 4)
+        self.assertEqual(g.threads_per_job(), 2)
+
+    @patch('squeeze_vid.governor.get_free_memory', return_value=None)
+    @patch('os.getloadavg')
+    def test__auto_jobs_follow_load(self, getloadavg, _):
+        g = Governor(jobs='auto', cpus='0-7')
+        self.assertEqual(g.max_jobs, 4)
+        # Busy system: start with fewer jobs.
+        getloadavg.return_value = (4.0, 4.0, 4.0)
+        self.assertEqual(g.allowed_jobs(0), 2)
+        # Overloaded after settling: scale down.
+        g.last_change -= governor.SETTLE_TIME
+        getloadavg.return_value = (10.0, 10.0, 10.0)
+        self.assertEqual(g.allowed_jobs(2), 1)
+        # Idle again after settling: scale up.
+        g.last_change -= governor.SETTLE_TIME
+        getloadavg.return_value = (1.0, 1.0, 1.0)
+        self.assertEqual(g.allowed_jobs(1), 2)
+
+    def test__run_all_items(self):
+        g = Governor(jobs=3, cpus='0-5')
+        results = g.run(lambda item, threads: (item, threads), range(5))
+        self.assertEqual(sorted(results), [(i, 2) for i in range(5)])
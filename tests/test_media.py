@@ -4,6 +4,7 @@ from pathlib import Path
 
 from squeeze_vid.app import get_parser
 from squeeze_vid.media import MediaObject
+from squeeze_vid.task import media_are_concat_compatible
 from squeeze_vid.task import SqueezeTask
 
 # Assert*() methods here:
@@ -24,6 +25,33 @@ class Command(unittest.TestCase):
         command = task.trim()
         self.assertIsInstance(command, str)
 
+    def test__command_vp9_threads(self):
+        args = self.parser.parse_args([str(self.infile), '--video_encoder', 'libvpx-vp9', '-c'])  # noqa: E501
+        task = SqueezeTask(args=args, media_in=self.media_in)
+        task.threads = 2
+        command = task.normalize()
+        self.assertIn('-cpu-used 4', command)
+        self.assertIn('-threads 2', command)
+
+    def test__command_join_copy(self):
+        args = self.parser.parse_args([str(self.infile), str(self.infile), '--join', '-c'])  # noqa: E501
+        task = SqueezeTask(args=args, media_in=self.media_in)
+        command = task.join([MediaObject(self.infile)])
+        self.assertIn('-f concat', command)
+        self.assertIn('-c:v copy', command)
+        self.assertNotIn('-filter_complex', command)
+
+    def test__command_join_encode(self):
+        args = self.parser.parse_args([str(self.infile), str(self.infile), '--join', '-c'])  # noqa: E501
+        task = SqueezeTask(args=args, media_in=self.media_in)
+        other = MediaObject(self.infile)
+        other.fps = other.fps * 2  # not compatible with stream copy
+        command = task.join([other])
+        self.assertNotIn('-f concat', command)
+        self.assertIn('-filter_complex', command)
+        self.assertIn('concat=n=2', command)
+        self.assertIn('-map [v]', command)
+
 
 class Conversion(unittest.TestCase):
     def setUp(self):
@@ -157,6 +185,33 @@ class Conversion(unittest.TestCase):
             pass
 
 
+class Join(unittest.TestCase):
+    def setUp(self):
+        self.medias = []
+        for i in range(3):
+            m = MediaObject(VIDEO_FILE.with_stem(f'MVI_000{i}'))
+            m.has_audio = m.has_video = True
+            m.acodec, m.sample_rate, m.channels = 'aac', 48000, 2
+            m.vcodec, m.width, m.height, m.fps = 'h264', 1920, 1080, 29.97
+            self.medias.append(m)
+
+    def test__compatible(self):
+        self.assertTrue(media_are_concat_compatible(self.medias))
+
+    def test__incompatible_fps(self):
+        self.medias[1].fps = 59.94
+        self.assertFalse(media_are_concat_compatible(self.medias))
+
+    def test__incompatible_audio_layout(self):
+        self.medias[2].channels = 1
+        self.assertFalse(media_are_concat_compatible(self.medias))
+
+    def test__incompatible_container(self):
+        for m in self.medias:
+            m.acodec = 'pcm_s16le'
+        self.assertFalse(media_are_concat_compatible(self.medias))
+
+
 class Media(unittest.TestCase):
     def setUp(self):
         self.infile_good = VIDEO_FILE
@@ -0,0 +1,88 @@
+import http.client
+import http.server
+import re
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from squeeze_vid.remote import CacheProxy
+from squeeze_vid.remote import ChunkCache
+from squeeze_vid.util import get_local_path
+from squeeze_vid.util import validate_file
+
+DATA = bytes(range(256)) * 64  # 16 KiB
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    # Stand-in for object storage: supports HEAD and single byte ranges.
+    protocol_version = 'HTTP/1.1'
+    requested = []
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(DATA)))
+        self.send_header('ETag', '"v1"')
+        self.end_headers()
+
+    def do_GET(self):
+        start, end = re.fullmatch(r'bytes=(\d+)-(\d+)', self.headers.get('Range')).groups()  # noqa: E501
+        start, end = int(start), int(end)
+        self.requested.append((start, end))
+        self.send_response(206)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Content-Range', f"bytes {start}-{end}/{len(DATA)}")  # noqa: E501
+        self.end_headers()
+        self.wfile.write(DATA[start:end+1])
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Remote(unittest.TestCase):
+    def setUp(self):
+        RangeHandler.requested = []
+        self.origin = http.server.ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)  # noqa: E501
+        threading.Thread(target=self.origin.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.origin.server_address[1]}/media/MVI_0001.MP4"  # noqa: E501
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = ChunkCache(Path(self.tmpdir.name), chunk_size=1024)
+
+    def test__url_input(self):
+        self.assertEqual(validate_file(self.url), self.url)
+        self.assertEqual(get_local_path(self.url), Path.cwd() / 'MVI_0001.MP4')  # noqa: E501
+
+    def test__only_needed_chunks_fetched(self):
+        data = b''.join(self.cache.iter_range(self.url, 5000, 6999))
+        self.assertEqual(data, DATA[5000:7000])
+        self.assertEqual(RangeHandler.requested, [(4096, 5119), (5120, 6143), (6144, 7167)])  # noqa: E501
+
+    def test__cached_chunks_reused(self):
+        list(self.cache.iter_range(self.url, 0, 2047))
+        requests = self.cache.connections.requests
+        cache = ChunkCache(Path(self.tmpdir.name), chunk_size=1024)
+        data = b''.join(cache.iter_range(self.url, 100, 2000))
+        self.assertEqual(data, DATA[100:2001])
+        # Only a HEAD request to validate the cached chunks.
+        self.assertEqual(len(RangeHandler.requested), 2)
+        self.assertEqual(cache.connections.requests, 1)
+        self.assertEqual(self.cache.connections.requests, requests)
+
+    def test__proxy_range_request(self):
+        proxy = CacheProxy(self.cache)
+        proxy.start()
+        proxy_url = proxy.url_for(self.url)
+        self.assertTrue(proxy_url.endswith('/MVI_0001.MP4'))
+        host, port = proxy.server.server_address[:2]
+        conn = http.client.HTTPConnection(host, port)
+        conn.request('GET', proxy_url.split(str(port), 1)[1], headers={'Range': 'bytes=-100'})  # noqa: E501
+        response = conn.getresponse()
+        self.assertEqual(response.status, 206)
+        self.assertEqual(response.read(), DATA[-100:])
+        conn.close()
+        proxy.stop()
+
+    def tearDown(self):
+        self.origin.shutdown()
+        self.origin.server_close()
+        self.tmpdir.cleanup()
@@ -0,0 +1,55 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from squeeze_vid.journal import Journal
+from squeeze_vid.verify import check_props
+
+PROBE = {
+    'format': {'duration': '60.02'},
+    'streams': [
+        {'codec_type': 'video', 'width': 1280, 'height': 720, 'avg_frame_rate': '25/1'},  # noqa: E501
+        {'codec_type': 'audio'},
+    ],
+}
+EXPECTED = {
+    'duration': 60.0,
+    'audio_streams': 1,
+    'video_streams': 1,
+    'height': 720,
+    'fps': 25,
+}
+
+
+class Verify(unittest.TestCase):
+    def test__good_output(self):
+        self.assertEqual(check_props(PROBE, EXPECTED), [])
+
+    def test__short_output(self):
+        probe = dict(PROBE, format={'duration': '31.5'})
+        problems = check_props(probe, EXPECTED)
+        self.assertEqual(len(problems), 1)
+        self.assertIn('duration', problems[0])
+
+    def test__missing_stream_and_wrong_fps(self):
+        video = dict(PROBE.get('streams')[0], avg_frame_rate='60/1')
+        probe = dict(PROBE, streams=[video])
+        problems = check_props(probe, EXPECTED)
+        self.assertEqual(len(problems), 2)
+
+    def test__extra_audio_stream(self):
+        streams = PROBE.get('streams') + [{'codec_type': 'audio'}]
+        problems = check_props(dict(PROBE, streams=streams), EXPECTED)
+        self.assertEqual(problems, ['audio streams: 2; expected 1'])
+
+    def test__journal(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / 'journal.jsonl'
+            journal = Journal(path)
+            journal.record(action='normalize', output='a.mp4', ok=True, problems=[])  # noqa: E501
+            journal.record(action='normalize', output='b.mp4', ok=False, problems=['audio stream is missing'])  # noqa: E501
+            lines = path.read_text().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertFalse(json.loads(lines[1]).get('ok'))
+        self.assertEqual(len(journal.failures), 1)